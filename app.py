@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 import flet as ft
@@ -5,12 +6,23 @@ import threading
 import random
 
 import serial
-from models import Pessoa, Paciente
-from database import Session, Base, engine
+from database import Base, engine
+from consultas_async import buscar_pessoa_por_cpf, salvar_triagem
+from impressao import Spooler, ImpressoraSerial, Ficha, proxima_senha
+from migracoes import aplicar_migracoes
+from regras import MotorTriagem
 import re
 
 # Configuração do banco de dados
 Base.metadata.create_all(engine)
+aplicar_migracoes(engine)
+
+# Spooler de impressão das fichas de espera
+spooler = Spooler(ImpressoraSerial('COM4', 9600))
+
+# Regras de triagem (recarregadas automaticamente quando o arquivo muda)
+motor_triagem = MotorTriagem("regras_triagem.json")
+motor_triagem.iniciar_monitoramento()
 
 # Funções utilitárias
 def limpar_cpf(cpf: str) -> str:
@@ -90,7 +102,7 @@ def tela_consulta(pagina: ft.Page) -> None:
 
     resultado = ft.Text(size=16, text_align=ft.TextAlign.CENTER)
 
-    def consultar_cpf(e):
+    async def consultar_cpf(e):
         global pessoa
         raw_cpf = limpar_cpf(cpf_input.value)
 
@@ -99,19 +111,18 @@ def tela_consulta(pagina: ft.Page) -> None:
             return
 
         try:
-            with Session() as session:
-                pessoa = session.query(Pessoa).filter_by(cpf=raw_cpf).first()
-
-                if not pessoa:
-                    mostrar_erro("CPF não encontrado!", pagina, resultado)
-                    return
-
-                resultado.value = ""
-                pagina.update()
-                tela_biometria(pagina)
-
+            pessoa = await buscar_pessoa_por_cpf(raw_cpf)
         except Exception as e:
             mostrar_erro(f"Erro de conexão: {str(e)}", pagina, resultado)
+            return
+
+        if not pessoa:
+            mostrar_erro("CPF não encontrado!", pagina, resultado)
+            return
+
+        resultado.value = ""
+        pagina.update()
+        tela_biometria(pagina)
 
     btn_voltar = ft.TextButton(
         "Voltar",
@@ -287,7 +298,7 @@ def tela_temperatura(pagina: ft.Page) -> None:
                 progress,
                 resultado,
                 ft.ElevatedButton("Medir Temperatura", on_click=iniciar_medicao, icon=ft.Icons.THERMOSTAT),
-                ft.TextButton("Voltar", on_click=lambda e: [parar_medicao(), tela_biometria(pagina, None)], icon=ft.Icons.ARROW_BACK)
+                ft.TextButton("Voltar", on_click=lambda e: [parar_medicao(), tela_biometria(pagina)], icon=ft.Icons.ARROW_BACK)
             ],
             spacing=25,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -515,8 +526,10 @@ def tela_sintomas(pagina: ft.Page) -> None:
     checkboxes = [ft.Checkbox(label=s) for s in sintomas]
     resultado = ft.Text()
 
-    def confirmar(e):
+    async def confirmar(e):
         global selecionados
+        if btn_confirmar.disabled:
+            return  # já confirmado; evita nova senha e nova ficha impressa
         selecionados = [cb.label for cb in checkboxes if cb.value]
 
         if not selecionados:
@@ -529,11 +542,6 @@ def tela_sintomas(pagina: ft.Page) -> None:
         resultado.color = ft.Colors.GREEN
         pagina.update()
 
-        # Sintomas graves definidos
-        sintomas_graves = {"Falta de ar", "Febre", "Cansaço"}
-        num_graves = len([s for s in selecionados if s in sintomas_graves])
-        sintomas_criticos = "Falta de ar" in selecionados and "Febre" in selecionados and "Cansaço" in selecionados
-
         # Tratamento dos valores globais (todos strings)
         try:
             temp = float(valor_temperatura.replace(",", "."))
@@ -545,24 +553,14 @@ def tela_sintomas(pagina: ft.Page) -> None:
             pagina.update()
             return
 
-        # Verificações clínicas
-        sinais_criticos = (
-                temp < 34 or temp >= 40 or
-                saturacao < 95 or
-                sistolica < 90 or sistolica > 180 or
-                diastolica < 60 or diastolica > 120
-        )
-
-        # Lógica de classificação
-        if sintomas_criticos or sinais_criticos:
-            cor = "vermelho"
-        elif num_graves >= 2 or len(selecionados) >= 4:
-            cor = "amarelo"
-        else:
-            cor = "verde"
+        # Classificação pelo protocolo vigente (regras_triagem.json)
+        cor, versao_regras = motor_triagem.avaliar(selecionados, temp, saturacao, sistolica, diastolica)
 
         # Redireciona após 4 segundos
-        threading.Timer(4, lambda: tela_classificacao(pagina, cor)).start()
+        btn_confirmar.disabled = True
+        pagina.update()
+        await asyncio.sleep(4)
+        await tela_classificacao(pagina, cor, versao_regras)
 
     btn_confirmar = ft.ElevatedButton("Confirmar", on_click=confirmar)
 
@@ -589,12 +587,8 @@ def tela_sintomas(pagina: ft.Page) -> None:
 
 
 # NOVA FUNÇÃO ADICIONADA
-def tela_classificacao(pagina: ft.Page, cor: str) -> None:
+async def tela_classificacao(pagina: ft.Page, cor: str, versao_regras: str | None = None) -> None:
     """Tela de classificação de risco do paciente"""
-    from models import Paciente
-    from database import Session
-    import datetime
-
     pagina.clean()
     pagina.title = "Vitally - Classificação de Risco"
 
@@ -608,30 +602,22 @@ def tela_classificacao(pagina: ft.Page, cor: str) -> None:
 
     # Persistência do paciente
     try:
-        with Session() as session:
-            # Verifica se já existe um paciente para essa pessoa
-            paciente = session.query(Paciente).filter_by(id=pessoa.id).first()
-            selecionadosString = ", ".join(selecionados)
-            if not paciente:
-                paciente = Paciente(
-                    id=pessoa.id,
-                    description=selecionadosString,
-                    temperatura=valor_temperatura,
-                    saturacao=valor_saturacao,
-                    pressao=valor_pressao,
-                    risk_level=risk_level,
-                    data_consulta=datetime.date.today(),
-                    hora_consulta=datetime.datetime.now().time()
-                )
-                session.add(paciente)
-            else:
-                paciente.risk_level = risk_level
-                paciente.data_consulta = datetime.date.today()
-                paciente.hora_consulta = datetime.datetime.now().time()
-            session.commit()
+        await salvar_triagem(
+            pessoa.id,
+            selecionados,
+            valor_temperatura,
+            valor_saturacao,
+            valor_pressao,
+            risk_level,
+            versao_regras
+        )
     except Exception as e:
         print(f"Erro ao salvar paciente: {e}")
 
+    # Impressão da ficha (não bloqueia a tela)
+    senha = proxima_senha()
+    spooler.enviar(Ficha(senha=senha, cor=cor))
+
     if cor == "verde":
         cor_texto = "Classificação Verde: Pouco Urgente"
         cor_corpo = ft.Colors.GREEN
@@ -653,6 +639,14 @@ def tela_classificacao(pagina: ft.Page, cor: str) -> None:
         text_align=ft.TextAlign.CENTER
     )
 
+    txt_senha = ft.Text(
+        f"Senha: {senha}",
+        size=32,
+        weight=ft.FontWeight.BOLD,
+        color=ft.Colors.WHITE,
+        text_align=ft.TextAlign.CENTER
+    )
+
     instrucoes = ft.Text(
         "Por favor, retire sua ficha de espera e aguarde ser chamado.",
         size=18,
@@ -665,6 +659,7 @@ def tela_classificacao(pagina: ft.Page, cor: str) -> None:
             content=ft.Column(
                 [
                     header,
+                    txt_senha,
                     instrucoes,
                     ft.Icon(name=ft.Icons.LOCAL_PRINTSHOP, size=64, color=ft.Colors.WHITE),
                     ft.TextButton(
@@ -0,0 +1,133 @@
+"""Benchmark de consultas de CPF concorrentes: threads + Session vs. asyncio + AsyncSession
+
+Uso:
+    python benchmark_consultas.py [--pessoas N] [--consultas N] [--concorrencia N] [--latencia MS]
+
+Por padrão usa um banco SQLite temporário (sqlite / aiosqlite). Para medir
+contra o MySQL, informe --url-sync e --url-async. --latencia simula o tempo
+de ida e volta da rede em cada consulta (time.sleep / asyncio.sleep).
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# database/database_async criam engines ao serem importados; o benchmark usa
+# apenas engines próprios (--url-sync/--url-async), então os globais apontam
+# para um SQLite em memória e não exigem os drivers do MySQL.
+os.environ["VITALLY_DATABASE_URL"] = "sqlite://"
+os.environ["VITALLY_DATABASE_URL_ASYNC"] = "sqlite+aiosqlite://"
+
+import database_async
+from consultas_async import buscar_pessoa_por_cpf
+from database import Base
+from models import Pessoa
+
+
+def popular(url_sync: str, quantidade: int) -> list[str]:
+    """Cria as tabelas e insere pessoas fictícias, retornando os CPFs"""
+    engine = create_engine(url_sync)
+    Base.metadata.create_all(engine)
+    cpfs = [f"{i:011d}" for i in range(1, quantidade + 1)]
+    with sessionmaker(bind=engine)() as session:
+        if session.query(Pessoa).count() < quantidade:
+            session.query(Pessoa).delete()
+            session.add_all(
+                Pessoa(
+                    name=f"Pessoa {i}",
+                    cpf=cpf,
+                    data_nascimento=datetime.date(1980, 1, 1),
+                    sexo="F",
+                    carteira=f"{i:015d}"
+                )
+                for i, cpf in enumerate(cpfs, start=1)
+            )
+            session.commit()
+    engine.dispose()
+    return cpfs
+
+
+def argumentos_pool(url: str, concorrencia: int) -> dict:
+    """Dimensiona o pool só quando o dialeto usa QueuePool (o aiosqlite usa NullPool em algumas versões 2.0)"""
+    url = make_url(url)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        return {"pool_size": concorrencia, "max_overflow": 0}
+    return {}
+
+
+def medir_threads(url_sync: str, cpfs: list[str], concorrencia: int, latencia: float) -> float:
+    """Abordagem atual: Session() síncrona por consulta, uma thread por consulta em andamento"""
+    engine = create_engine(url_sync, **argumentos_pool(url_sync, concorrencia))
+    Session = sessionmaker(bind=engine)
+
+    def consultar(cpf: str):
+        with Session() as session:
+            if latencia:
+                time.sleep(latencia)
+            return session.query(Pessoa).filter_by(cpf=cpf).first()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(consultar, cpfs))
+    decorrido = time.perf_counter() - inicio
+    engine.dispose()
+    return decorrido
+
+
+async def medir_async(url_async: str, cpfs: list[str], concorrencia: int, latencia: float) -> float:
+    """Nova abordagem: consultas em corrotinas sobre o engine assíncrono"""
+    database_async.configurar(url_async, **argumentos_pool(url_async, concorrencia))
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def consultar(cpf: str):
+        async with limite:
+            if latencia:
+                await asyncio.sleep(latencia)
+            return await buscar_pessoa_por_cpf(cpf)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(consultar(cpf) for cpf in cpfs))
+    decorrido = time.perf_counter() - inicio
+    await database_async.engine_async.dispose()
+    return decorrido
+
+
+def main() -> None:
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Compara consultas de CPF síncronas (threads) e assíncronas")
+    parser.add_argument("--pessoas", type=int, default=1000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--latencia", type=float, default=0, help="Latência simulada por consulta, em ms")
+    parser.add_argument("--url-sync")
+    parser.add_argument("--url-async")
+    args = parser.parse_args()
+
+    if not args.url_sync or not args.url_async:
+        caminho = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        args.url_sync = f"sqlite:///{caminho}"
+        args.url_async = f"sqlite+aiosqlite:///{caminho}"
+
+    cpfs = popular(args.url_sync, args.pessoas)
+    amostra = [random.choice(cpfs) for _ in range(args.consultas)]
+    latencia = args.latencia / 1000
+
+    tempo_threads = medir_threads(args.url_sync, amostra, args.concorrencia, latencia)
+    tempo_async = asyncio.run(medir_async(args.url_async, amostra, args.concorrencia, latencia))
+
+    print(f"{args.consultas} consultas, concorrência {args.concorrencia}, latência simulada {args.latencia} ms")
+    print(f"threads: {tempo_threads:.3f} s ({args.consultas / tempo_threads:.0f} consultas/s)")
+    print(f"asyncio: {tempo_async:.3f} s ({args.consultas / tempo_async:.0f} consultas/s)")
+
+
+if __name__ == "__main__":
+    main()
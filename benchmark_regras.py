@@ -0,0 +1,83 @@
+"""Microbenchmark do motor de regras de triagem
+
+Uso:
+    python benchmark_regras.py [--regras ARQUIVO] [--avaliacoes N]
+
+Mede avaliações por segundo do protocolo compilado e compara com a lógica
+fixa que existia em `confirmar` (tela_sintomas), verificando também que as
+duas produzem a mesma cor para as mesmas entradas.
+"""
+import argparse
+import random
+import time
+
+from regras import carregar
+
+SINTOMAS = [
+    "Tosse", "Dor de cabeça", "Cansaço",
+    "Dor no corpo", "Falta de ar", "Perda de olfato", "Dor de garganta"
+]
+
+
+def classificar_fixo(selecionados, temp, saturacao, sistolica, diastolica) -> str:
+    """Lógica original, com os limiares escritos no código"""
+    sintomas_graves = {"Falta de ar", "Febre", "Cansaço"}
+    num_graves = len([s for s in selecionados if s in sintomas_graves])
+    sintomas_criticos = "Falta de ar" in selecionados and "Febre" in selecionados and "Cansaço" in selecionados
+    sinais_criticos = (
+            temp < 34 or temp >= 40 or
+            saturacao < 95 or
+            sistolica < 90 or sistolica > 180 or
+            diastolica < 60 or diastolica > 120
+    )
+    if sintomas_criticos or sinais_criticos:
+        return "vermelho"
+    elif num_graves >= 2 or len(selecionados) >= 4:
+        return "amarelo"
+    return "verde"
+
+
+def gerar_entradas(quantidade: int) -> list[tuple]:
+    return [
+        (
+            random.sample(SINTOMAS + ["Febre"], random.randint(1, 5)),
+            round(random.uniform(33.0, 41.0), 1),
+            random.randint(88, 100),
+            random.randint(80, 190),
+            random.randint(50, 130),
+        )
+        for _ in range(quantidade)
+    ]
+
+
+def medir(funcao, entradas: list[tuple]) -> float:
+    inicio = time.perf_counter()
+    for entrada in entradas:
+        funcao(*entrada)
+    return len(entradas) / (time.perf_counter() - inicio)
+
+
+def main() -> None:
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Avaliações por segundo do motor de regras de triagem")
+    parser.add_argument("--regras", default="regras_triagem.json")
+    parser.add_argument("--avaliacoes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    protocolo = carregar(args.regras)
+    entradas = gerar_entradas(args.avaliacoes)
+
+    divergencias = sum(1 for e in entradas if protocolo.avaliar(*e) != classificar_fixo(*e))
+
+    inicio = time.perf_counter()
+    carregar(args.regras)
+    tempo_compilacao = time.perf_counter() - inicio
+
+    print(f"Protocolo {protocolo.versao}: {protocolo.num_regras} regras, compilado em {tempo_compilacao * 1000:.2f} ms")
+    print(f"compilado: {medir(protocolo.avaliar, entradas):,.0f} avaliações/s")
+    print(f"fixo:      {medir(classificar_fixo, entradas):,.0f} avaliações/s")
+    print(f"divergências em relação à lógica fixa: {divergencias}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import datetime
+
+from sqlalchemy import select
+
+from database_async import AsyncSession
+from models import Pessoa, Paciente
+
+
+async def buscar_pessoa_por_cpf(cpf: str) -> Pessoa | None:
+    """Busca a pessoa pelo CPF (somente dígitos)"""
+    async with AsyncSession() as session:
+        resultado = await session.execute(select(Pessoa).filter_by(cpf=cpf))
+        return resultado.scalars().first()
+
+
+async def salvar_triagem(pessoa_id: int, sintomas: list[str], temperatura: str | None,
+                         saturacao: str | None, pressao: str | None, risk_level: int,
+                         versao_regras: str | None = None) -> None:
+    """Cria ou atualiza o registro de paciente com o resultado da triagem"""
+    async with AsyncSession() as session:
+        paciente = await session.get(Paciente, pessoa_id)
+        if not paciente:
+            paciente = Paciente(
+                id=pessoa_id,
+                description=", ".join(sintomas),
+                temperatura=temperatura,
+                saturacao=saturacao,
+                pressao=pressao,
+                risk_level=risk_level,
+                versao_regras=versao_regras,
+                data_consulta=datetime.date.today(),
+                hora_consulta=datetime.datetime.now().time()
+            )
+            session.add(paciente)
+        else:
+            paciente.risk_level = risk_level
+            paciente.versao_regras = versao_regras
+            paciente.data_consulta = datetime.date.today()
+            paciente.hora_consulta = datetime.datetime.now().time()
+        await session.commit()
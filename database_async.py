@@ -0,0 +1,39 @@
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database import Base, DATABASE_URL
+
+# Driver assíncrono usado para cada banco quando a URL assíncrona não é informada
+DRIVERS_ASYNC = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def url_async(url_sync: str) -> str:
+    """Converte a URL síncrona para o driver assíncrono do mesmo banco"""
+    url = make_url(url_sync)
+    return url.set(drivername=DRIVERS_ASYNC[url.get_backend_name()]).render_as_string(hide_password=False)
+
+
+# Por padrão usa o mesmo banco de database.DATABASE_URL, para que leituras e
+# escritas síncronas e assíncronas nunca fiquem em bancos diferentes
+DATABASE_URL_ASYNC = os.environ.get("VITALLY_DATABASE_URL_ASYNC") or url_async(DATABASE_URL)
+
+engine_async = create_async_engine(DATABASE_URL_ASYNC, echo=True)
+AsyncSession = async_sessionmaker(bind=engine_async, expire_on_commit=False)
+
+
+def configurar(url: str, **kwargs) -> None:
+    """Troca o engine assíncrono (ex.: aiosqlite nos testes) mantendo a mesma fábrica de sessões"""
+    global engine_async
+    engine_async = create_async_engine(url, **kwargs)
+    AsyncSession.configure(bind=engine_async)
+
+
+async def criar_tabelas() -> None:
+    async with engine_async.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,297 @@
+"""Exportação colunar do histórico de triagem (Parquet/Arrow)
+
+Uso:
+    python exportacao.py DESTINO [--formato parquet|arrow] [--lote N] [--incremental]
+
+As linhas de `paciente` unidas a `pessoa` são lidas por paginação por chave
+(keyset): cada página é um SELECT com `WHERE (data_consulta, hora_consulta,
+id) > última chave ORDER BY ... LIMIT --lote`. O mysql-connector não tem
+cursor do lado do servidor (o SQLAlchemy força `buffered=True`), então
+`yield_per` carregaria o resultado inteiro na memória do cliente; com
+páginas limitadas a memória fica constante. As linhas são gravadas em lotes
+de tamanho limitado, particionadas por data da consulta:
+
+    DESTINO/data_consulta=2025-01-31/parte-20250201T030000123456-1a2b3c4d.parquet
+
+A data da consulta vem apenas do nome do diretório (particionamento hive),
+para que leitores como `pyarrow.dataset(DESTINO, partitioning="hive")`
+abram o diretório inteiro.
+
+Com --incremental, apenas as consultas a partir da última marca d'água
+gravada em DESTINO são exportadas. Como `hora_consulta` tem resolução de
+segundos, a comparação é inclusiva e os ids já exportados no último
+instante são descartados.
+"""
+import argparse
+import datetime
+import json
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import String, and_, inspect, literal, or_, select
+
+from database import Session, engine
+from models import Pessoa, Paciente
+from sinais_vitais import decodificar_temperatura, decodificar_saturacao, decodificar_pressao
+
+ARQUIVO_MARCA_DAGUA = "_marca_dagua.json"
+TAMANHO_LOTE_PADRAO = 50_000
+
+ESQUEMA = pa.schema([
+    ("id", pa.int32()),
+    ("nome", pa.string()),
+    ("cpf", pa.string()),
+    ("data_nascimento", pa.date32()),
+    ("sexo", pa.string()),
+    ("carteira", pa.string()),
+    ("sintomas", pa.string()),
+    ("temperatura", pa.float64()),
+    ("saturacao", pa.int16()),
+    ("pressao_sistolica", pa.int16()),
+    ("pressao_diastolica", pa.int16()),
+    ("risk_level", pa.int8()),
+    ("versao_regras", pa.string()),
+    ("hora_consulta", pa.time64("us")),
+])
+
+
+# Marca d'água: (data, hora, ids exportados exatamente nessa data/hora)
+MarcaDagua = tuple[datetime.date, datetime.time, frozenset[int]]
+
+
+def ler_marca_dagua(destino: str) -> MarcaDagua | None:
+    """Lê a última (data, hora) de consulta exportada, se houver"""
+    caminho = os.path.join(destino, ARQUIVO_MARCA_DAGUA)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    return (
+        datetime.date.fromisoformat(dados["data_consulta"]),
+        datetime.time.fromisoformat(dados["hora_consulta"]),
+        frozenset(dados.get("ids", [])),
+    )
+
+
+def gravar_marca_dagua(destino: str, data: datetime.date, hora: datetime.time, ids: set[int]) -> None:
+    """Grava a marca d'água de forma atômica (arquivo temporário + rename)"""
+    caminho = os.path.join(destino, ARQUIVO_MARCA_DAGUA)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump({
+            "data_consulta": data.isoformat(),
+            "hora_consulta": hora.isoformat(),
+            "ids": sorted(ids),
+        }, arquivo)
+    os.replace(temporario, caminho)
+
+
+# Consulta
+Chave = tuple[datetime.date, datetime.time, int]
+
+
+def _coluna_versao_regras():
+    """Paciente.versao_regras, ou NULL se o banco ainda não foi migrado
+
+    A exportação é somente leitura e não aplica migrações (ver migracoes.py);
+    bancos antigos simplesmente exportam a coluna vazia.
+    """
+    colunas = {coluna["name"] for coluna in inspect(engine).get_columns(Paciente.__tablename__)}
+    if "versao_regras" in colunas:
+        return Paciente.versao_regras
+    print("Aviso: coluna paciente.versao_regras ausente; exportando versao_regras vazia")
+    return literal(None, type_=String).label("versao_regras")
+
+
+def montar_consulta(marca_dagua: MarcaDagua | None, chave: Chave | None, tamanho_lote: int,
+                    versao_regras):
+    """Monta o SELECT de uma página, ordenado por (data, hora, id)
+
+    Na primeira página parte da marca d'água (inclusiva); nas seguintes,
+    da chave da última linha lida (exclusiva).
+    """
+    consulta = (
+        select(
+            Paciente.id,
+            Pessoa.name,
+            Pessoa.cpf,
+            Pessoa.data_nascimento,
+            Pessoa.sexo,
+            Pessoa.carteira,
+            Paciente.description,
+            Paciente.temperatura,
+            Paciente.saturacao,
+            Paciente.pressao,
+            Paciente.risk_level,
+            versao_regras,
+            Paciente.data_consulta,
+            Paciente.hora_consulta,
+        )
+        .join(Pessoa, Pessoa.id == Paciente.id)
+        .where(Paciente.data_consulta.is_not(None), Paciente.hora_consulta.is_not(None))
+        .order_by(Paciente.data_consulta, Paciente.hora_consulta, Paciente.id)
+        .limit(tamanho_lote)
+    )
+    if chave:
+        data, hora, id_ = chave
+        consulta = consulta.where(or_(
+            Paciente.data_consulta > data,
+            and_(Paciente.data_consulta == data, Paciente.hora_consulta > hora),
+            and_(Paciente.data_consulta == data, Paciente.hora_consulta == hora, Paciente.id > id_),
+        ))
+    elif marca_dagua:
+        data, hora, _ = marca_dagua
+        consulta = consulta.where(or_(
+            Paciente.data_consulta > data,
+            and_(Paciente.data_consulta == data, Paciente.hora_consulta >= hora),
+        ))
+    return consulta
+
+
+# Escrita
+class EscritorParticionado:
+    """Mantém aberto apenas o arquivo da partição (data) corrente"""
+
+    def __init__(self, destino: str, formato: str, sufixo: str):
+        self.destino = destino
+        self.formato = formato
+        self.sufixo = sufixo
+        self.data_atual = None
+        self.escritor = None
+        self.arquivo = None
+        self.linhas = 0
+
+    def escrever(self, data: datetime.date, lote: pa.RecordBatch) -> None:
+        if data != self.data_atual:
+            self.fechar()
+            self._abrir(data)
+        if self.formato == "parquet":
+            self.escritor.write_batch(lote)
+        else:
+            self.escritor.write(lote)
+        self.linhas += lote.num_rows
+
+    def _abrir(self, data: datetime.date) -> None:
+        pasta = os.path.join(self.destino, f"data_consulta={data.isoformat()}")
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"parte-{self.sufixo}.{self.formato}")
+        if self.formato == "parquet":
+            self.escritor = pq.ParquetWriter(caminho, ESQUEMA, compression="snappy")
+        else:
+            self.arquivo = pa.OSFile(caminho, "wb")
+            self.escritor = ipc.new_file(self.arquivo, ESQUEMA)
+        self.data_atual = data
+
+    def fechar(self) -> None:
+        if self.escritor is not None:
+            self.escritor.close()
+            self.escritor = None
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+        self.data_atual = None
+
+
+def _novas_colunas() -> dict[str, list]:
+    return {campo.name: [] for campo in ESQUEMA}
+
+
+def _acrescentar_linha(colunas: dict[str, list], linha) -> None:
+    (id_, nome, cpf, nascimento, sexo, carteira, sintomas,
+     temperatura, saturacao, pressao, risk_level, versao_regras, _, hora) = linha
+    sistolica, diastolica = decodificar_pressao(pressao)
+    colunas["id"].append(id_)
+    colunas["nome"].append(nome)
+    colunas["cpf"].append(cpf)
+    colunas["data_nascimento"].append(nascimento)
+    colunas["sexo"].append(sexo)
+    colunas["carteira"].append(carteira)
+    colunas["sintomas"].append(sintomas)
+    colunas["temperatura"].append(decodificar_temperatura(temperatura))
+    colunas["saturacao"].append(decodificar_saturacao(saturacao))
+    colunas["pressao_sistolica"].append(sistolica)
+    colunas["pressao_diastolica"].append(diastolica)
+    colunas["risk_level"].append(risk_level)
+    colunas["versao_regras"].append(versao_regras)
+    colunas["hora_consulta"].append(hora)
+
+
+def exportar(destino: str, formato: str = "parquet", tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+             incremental: bool = False) -> int:
+    """Exporta o histórico de triagem e retorna o número de linhas gravadas"""
+    os.makedirs(destino, exist_ok=True)
+    marca_dagua = ler_marca_dagua(destino) if incremental else None
+    sufixo = f"{datetime.datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    escritor = EscritorParticionado(destino, formato, sufixo)
+
+    colunas = _novas_colunas()
+    data_lote = None
+    ultima = marca_dagua[:2] if marca_dagua else None
+    ids_ultima = set(marca_dagua[2]) if marca_dagua else set()
+    exportadas = 0
+
+    def descarregar():
+        nonlocal colunas
+        if colunas["id"]:
+            escritor.escrever(data_lote, pa.RecordBatch.from_pydict(colunas, schema=ESQUEMA))
+            colunas = _novas_colunas()
+
+    versao_regras = _coluna_versao_regras()
+    chave = None
+    try:
+        with Session() as session:
+            # Cada página tem no máximo `tamanho_lote` linhas; o lote também
+            # é descarregado quando a data da consulta muda.
+            while True:
+                pagina = session.execute(
+                    montar_consulta(marca_dagua, chave, tamanho_lote, versao_regras)
+                ).all()
+                if not pagina:
+                    break
+                ultima_linha = pagina[-1]
+                chave = (ultima_linha.data_consulta, ultima_linha.hora_consulta, ultima_linha.id)
+
+                for linha in pagina:
+                    instante = (linha.data_consulta, linha.hora_consulta)
+                    if instante == ultima and linha.id in ids_ultima:
+                        continue  # já exportada na execução anterior
+                    if instante != ultima:
+                        ultima = instante
+                        ids_ultima = set()
+                    ids_ultima.add(linha.id)
+                    exportadas += 1
+
+                    data = linha.data_consulta
+                    if data != data_lote:
+                        descarregar()
+                        data_lote = data
+                    _acrescentar_linha(colunas, linha)
+                descarregar()
+                if len(pagina) < tamanho_lote:
+                    break
+    finally:
+        escritor.fechar()
+
+    if exportadas:
+        gravar_marca_dagua(destino, *ultima, ids_ultima)
+    return escritor.linhas
+
+
+def main() -> None:
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Exporta o histórico de triagem para Parquet/Arrow")
+    parser.add_argument("destino", help="Diretório de saída")
+    parser.add_argument("--formato", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_PADRAO, help="Linhas por lote")
+    parser.add_argument("--incremental", action="store_true", help="Exporta apenas desde a última marca d'água")
+    args = parser.parse_args()
+
+    total = exportar(args.destino, args.formato, args.lote, args.incremental)
+    print(f"{total} linhas exportadas para {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Spooler assíncrono de impressão de fichas de espera (ESC/POS)
+
+As fichas são renderizadas a partir de modelos pré-compilados em bytes
+ESC/POS e entregues à impressora por uma thread de trabalho com novas
+tentativas, de modo que uma impressora travada nunca bloqueia a interface.
+"""
+import collections
+import datetime
+import itertools
+import queue
+import re
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+
+import serial
+
+# Comandos ESC/POS
+ESC = b"\x1b"
+GS = b"\x1d"
+
+COMANDOS = {
+    "inicio": ESC + b"@" + ESC + b"t\x03",  # reinicia e seleciona a página de código PC860
+    "centro": ESC + b"a\x01",
+    "esquerda": ESC + b"a\x00",
+    "negrito": ESC + b"E\x01",
+    "/negrito": ESC + b"E\x00",
+    "grande": GS + b"!\x11",
+    "normal": GS + b"!\x00",
+    "avanco": ESC + b"d\x04",
+    "corte": GS + b"V\x42\x00",
+}
+
+CODIFICACAO = "cp860"
+
+MODELO_FICHA = (
+    "<inicio><centro><negrito>VITALLY</negrito>\n"
+    "Ficha de espera\n\n"
+    "<grande><negrito>{senha}</negrito><normal>\n\n"
+    "Classificação: <negrito>{classificacao}</negrito>\n"
+    "{emitida_em}\n"
+    "<esquerda><avanco><corte>"
+)
+
+CLASSIFICACOES = {
+    "verde": "VERDE - Pouco Urgente",
+    "amarelo": "AMARELO - Urgente",
+    "vermelho": "VERMELHO - Emergência",
+}
+
+_PADRAO_COMANDO = re.compile(r"<(/?\w+)>")
+
+
+class ModeloCompilado:
+    """Modelo de ficha convertido uma única vez em trechos de bytes e campos"""
+
+    def __init__(self, modelo: str):
+        self.partes: list[bytes | str] = []
+        for literal, campo, _, _ in string.Formatter().parse(modelo):
+            if literal:
+                self.partes.append(self._compilar_literal(literal))
+            if campo is not None:
+                self.partes.append(campo)
+
+    @staticmethod
+    def _compilar_literal(literal: str) -> bytes:
+        trechos = []
+        posicao = 0
+        for comando in _PADRAO_COMANDO.finditer(literal):
+            trechos.append(literal[posicao:comando.start()].encode(CODIFICACAO, "replace"))
+            trechos.append(COMANDOS[comando.group(1)])
+            posicao = comando.end()
+        trechos.append(literal[posicao:].encode(CODIFICACAO, "replace"))
+        return b"".join(trechos)
+
+    def renderizar(self, **valores) -> bytes:
+        return b"".join(
+            parte if isinstance(parte, bytes) else str(valores[parte]).encode(CODIFICACAO, "replace")
+            for parte in self.partes
+        )
+
+
+modelo_ficha = ModeloCompilado(MODELO_FICHA)
+
+
+@dataclass
+class Ficha:
+    senha: str
+    cor: str
+    emitida_em: datetime.datetime = field(default_factory=datetime.datetime.now)
+
+    def renderizar(self) -> bytes:
+        return modelo_ficha.renderizar(
+            senha=self.senha,
+            classificacao=CLASSIFICACOES.get(self.cor, self.cor.upper()),
+            emitida_em=self.emitida_em.strftime("%d/%m/%Y %H:%M:%S"),
+        )
+
+
+_contador_senha = itertools.count(1)
+_trava_senha = threading.Lock()
+
+
+def proxima_senha() -> str:
+    """Gera o próximo número da fila de espera"""
+    with _trava_senha:
+        return f"{next(_contador_senha):03d}"
+
+
+# Impressoras
+class ImpressoraSerial:
+    """Impressora térmica ESC/POS ligada a uma porta serial"""
+
+    def __init__(self, porta: str, baudrate: int = 9600, timeout: float = 5):
+        self.porta = porta
+        self.baudrate = baudrate
+        self.timeout = timeout
+
+    def imprimir(self, dados: bytes) -> None:
+        with serial.Serial(self.porta, self.baudrate, timeout=self.timeout, write_timeout=self.timeout) as ser:
+            ser.write(dados)
+            ser.flush()
+
+
+class ImpressoraArquivo:
+    """Impressora virtual: acrescenta os bytes ESC/POS a um arquivo"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.trava = threading.Lock()
+
+    def imprimir(self, dados: bytes) -> None:
+        with self.trava, open(self.caminho, "ab") as arquivo:
+            arquivo.write(dados)
+
+
+# Métricas
+class MetricasSpool:
+    """Contadores de vazão e latência (envio -> impressão) do spooler
+
+    A vazão é calculada sobre a janela deslizante dos últimos `janela`
+    segundos, e não desde o início: num quiosque ligado por semanas a média
+    acumulada tenderia a zero.
+    """
+
+    def __init__(self, amostras: int = 1000, janela: float = 60.0):
+        self.trava = threading.Lock()
+        self.inicio = time.monotonic()
+        self.janela = janela
+        self.enviados = 0
+        self.impressos = 0
+        self.falhas = 0
+        self.tentativas = 0
+        self.latencias = collections.deque(maxlen=amostras)
+        self.instantes_impressao = collections.deque()
+
+    def registrar_envio(self) -> None:
+        with self.trava:
+            self.enviados += 1
+
+    def registrar_tentativa(self) -> None:
+        with self.trava:
+            self.tentativas += 1
+
+    def registrar_impressao(self, latencia: float) -> None:
+        with self.trava:
+            agora = time.monotonic()
+            self.impressos += 1
+            self.latencias.append(latencia)
+            self.instantes_impressao.append(agora)
+            self._descartar_antigos(agora)
+
+    def _descartar_antigos(self, agora: float) -> None:
+        while self.instantes_impressao and self.instantes_impressao[0] < agora - self.janela:
+            self.instantes_impressao.popleft()
+
+    def registrar_falha(self) -> None:
+        with self.trava:
+            self.falhas += 1
+
+    def resumo(self) -> dict:
+        with self.trava:
+            agora = time.monotonic()
+            self._descartar_antigos(agora)
+            periodo = min(self.janela, agora - self.inicio)
+            latencias = sorted(self.latencias)
+            return {
+                "enviados": self.enviados,
+                "impressos": self.impressos,
+                "falhas": self.falhas,
+                "tentativas": self.tentativas,
+                "pendentes": self.enviados - self.impressos - self.falhas,
+                "vazao_por_segundo": len(self.instantes_impressao) / periodo if periodo else 0.0,
+                "latencia_p50": _percentil(latencias, 0.50),
+                "latencia_p95": _percentil(latencias, 0.95),
+                "latencia_max": latencias[-1] if latencias else None,
+            }
+
+
+def _percentil(valores: list[float], fracao: float) -> float | None:
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, int(len(valores) * fracao))]
+
+
+# Spooler
+class Spooler:
+    """Fila de impressão com uma thread de trabalho e novas tentativas"""
+
+    def __init__(self, impressora, max_tentativas: int = 5, espera_inicial: float = 0.5,
+                 espera_maxima: float = 10.0):
+        self.impressora = impressora
+        self.max_tentativas = max_tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.metricas = MetricasSpool()
+        self.fila = queue.Queue()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._trabalhar, name="spooler-impressao", daemon=True)
+        self._thread.start()
+
+    def enviar(self, ficha: Ficha) -> None:
+        """Enfileira a ficha sem bloquear; a renderização ocorre na thread de trabalho"""
+        self.metricas.registrar_envio()
+        self.fila.put((ficha, time.monotonic()))
+
+    def aguardar(self) -> None:
+        """Bloqueia até que todas as fichas enfileiradas sejam processadas"""
+        self.fila.join()
+
+    def encerrar(self, timeout: float | None = None) -> None:
+        self._parar.set()
+        self.fila.put(None)
+        self._thread.join(timeout)
+
+    def _trabalhar(self) -> None:
+        while True:
+            item = self.fila.get()
+            try:
+                if item is None:
+                    return
+                ficha, enviada_em = item
+                self._entregar(ficha, enviada_em)
+            finally:
+                self.fila.task_done()
+
+    def _entregar(self, ficha: Ficha, enviada_em: float) -> None:
+        dados = ficha.renderizar()
+        espera = self.espera_inicial
+        for tentativa in range(1, self.max_tentativas + 1):
+            self.metricas.registrar_tentativa()
+            try:
+                self.impressora.imprimir(dados)
+                self.metricas.registrar_impressao(time.monotonic() - enviada_em)
+                return
+            except Exception as e:
+                print(f"Erro ao imprimir ficha {ficha.senha} (tentativa {tentativa}): {e}")
+                if tentativa == self.max_tentativas or self._parar.wait(espera):
+                    break
+                espera = min(espera * 2, self.espera_maxima)
+        self.metricas.registrar_falha()
@@ -0,0 +1,40 @@
+"""Migrações de esquema idempotentes
+
+Base.metadata.create_all só cria tabelas ausentes; colunas novas em tabelas
+já existentes (bancos dos quiosques em produção) são adicionadas aqui com
+ALTER TABLE, apenas quando ainda não existem.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from models import Paciente
+
+# (tabela, coluna) adicionadas depois da criação original do esquema
+COLUNAS_ADICIONADAS = [
+    (Paciente.__table__, "versao_regras"),
+]
+
+
+def _colunas_existentes(engine, tabela: str) -> set[str]:
+    return {coluna["name"] for coluna in inspect(engine).get_columns(tabela)}
+
+
+def aplicar_migracoes(engine) -> None:
+    """Adiciona as colunas de COLUNAS_ADICIONADAS que faltarem no banco"""
+    preparador = engine.dialect.identifier_preparer
+    for tabela, nome in COLUNAS_ADICIONADAS:
+        if not inspect(engine).has_table(tabela.name):
+            continue  # será criada completa pelo create_all
+        if nome in _colunas_existentes(engine, tabela.name):
+            continue
+
+        tipo = tabela.c[nome].type.compile(dialect=engine.dialect)
+        comando = f"ALTER TABLE {preparador.quote(tabela.name)} ADD COLUMN {preparador.quote(nome)} {tipo}"
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(comando))
+        except DBAPIError:
+            # Outro quiosque pode ter aplicado a mesma migração ao mesmo tempo
+            if nome not in _colunas_existentes(engine, tabela.name):
+                raise
+        print(f"Migração aplicada: {tabela.name}.{nome}")
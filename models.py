@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, String, Date, Time, Text, ForeignKey
 from database import Base
+from regras import TAMANHO_VERSAO
 
 class Pessoa(Base):
     __tablename__ = 'pessoa'
@@ -24,6 +25,7 @@ class Paciente(Base):
     saturacao =Column(Text, nullable=True)
     pressao = Column(Text, nullable=True)
     risk_level = Column(Integer, nullable=True)
+    versao_regras = Column(String(TAMANHO_VERSAO), nullable=True)  # versão do protocolo de triagem (regras_triagem.json)
     data_consulta = Column(Date, nullable=True)
     hora_consulta = Column(Time, nullable=True)
 
@@ -0,0 +1,215 @@
+"""Motor de regras de triagem declarativo com recarga a quente
+
+O protocolo é lido de um arquivo JSON versionado (ver regras_triagem.json),
+compilado uma única vez em uma função Python e substituído de forma atômica
+sempre que o arquivo muda, sem reiniciar o ft.app. Formato:
+
+    {
+      "versao": "vitally-2025.1",
+      "padrao": "verde",
+      "sintomas_graves": ["Falta de ar", ...],
+      "regras": [
+        {"nome": "...", "cor": "vermelho", "algum": [CONDICAO, ...]},
+        {"nome": "...", "cor": "amarelo", "todos": [CONDICAO, ...]}
+      ]
+    }
+
+As regras são avaliadas em ordem e a primeira que casar define a cor.
+Cada regra tem exatamente um de "todos"/"algum". Cada CONDICAO é uma
+comparação {"campo": ..., "op": ..., "valor": ...} sobre os campos de
+CAMPOS, ou {"sintomas_incluem": [...]}, que exige que todos os sintomas
+listados tenham sido selecionados. A validação é estrita: chaves
+desconhecidas ou conflitantes rejeitam o arquivo inteiro.
+"""
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+OPERADORES = {"<", "<=", ">", ">=", "==", "!="}
+
+CORES = {"verde", "amarelo", "vermelho"}
+
+# Campos disponíveis nas comparações (variáveis locais do avaliador gerado)
+CAMPOS = {"temperatura", "saturacao", "sistolica", "diastolica", "num_sintomas", "num_graves"}
+
+# Tamanho de paciente.versao_regras (models.Paciente usa esta constante)
+TAMANHO_VERSAO = 50
+
+CHAVES_PROTOCOLO = {"versao", "padrao", "sintomas_graves", "regras"}
+CHAVES_REGRA = {"nome", "cor", "todos", "algum"}
+CHAVES_COMPARACAO = {"campo", "op", "valor"}
+CHAVES_SINTOMAS = {"sintomas_incluem"}
+
+
+@dataclass(frozen=True)
+class ProtocoloCompilado:
+    versao: str
+    padrao: str
+    num_regras: int
+    avaliador: Callable[..., str]
+
+    def avaliar(self, sintomas, temperatura: float, saturacao: int, sistolica: int, diastolica: int) -> str:
+        """Retorna a cor de classificação para os sintomas e sinais vitais"""
+        return self.avaliador(frozenset(sintomas), temperatura, saturacao, sistolica, diastolica)
+
+
+# Compilação
+# O protocolo validado é traduzido para o código-fonte de uma única função,
+# compilada com compile(): a avaliação fica tão barata quanto os limiares
+# escritos à mão. Somente campos, operadores e números validados entram no
+# código; os conjuntos de sintomas são passados como constantes nomeadas.
+def _sintomas(valor, contexto: str) -> frozenset:
+    if not isinstance(valor, list) or not all(isinstance(s, str) for s in valor):
+        raise ValueError(f"'{contexto}' deve ser uma lista de sintomas (strings): {valor!r}")
+    return frozenset(valor)
+
+
+def _verificar_chaves(definicao: dict, permitidas: set, contexto: str) -> None:
+    desconhecidas = set(definicao) - permitidas
+    if desconhecidas:
+        raise ValueError(f"Chaves desconhecidas em {contexto}: {sorted(desconhecidas)}")
+
+
+def _compilar_condicao(definicao: dict, constantes: dict) -> str:
+    if not isinstance(definicao, dict):
+        raise ValueError(f"Condição inválida: {definicao!r}")
+    if "sintomas_incluem" in definicao:
+        _verificar_chaves(definicao, CHAVES_SINTOMAS, f"condição {definicao!r}")
+        nome = f"_sintomas_{len(constantes)}"
+        constantes[nome] = _sintomas(definicao["sintomas_incluem"], "sintomas_incluem")
+        return f"{nome} <= selecionados"
+
+    _verificar_chaves(definicao, CHAVES_COMPARACAO, f"condição {definicao!r}")
+    campo = definicao.get("campo")
+    if campo not in CAMPOS:
+        raise ValueError(f"Campo desconhecido na condição: {campo!r}")
+    op = definicao.get("op")
+    if op not in OPERADORES:
+        raise ValueError(f"Operador desconhecido na condição: {op!r}")
+    valor = definicao.get("valor")
+    # NaN/Infinity (aceitos pelo json) virariam os nomes inexistentes nan/inf no código gerado
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+        raise ValueError(f"Valor inválido na condição: {definicao!r}")
+    return f"{campo} {op} {valor!r}"
+
+
+def _compilar_regra(definicao: dict, constantes: dict) -> str:
+    if not isinstance(definicao, dict):
+        raise ValueError(f"Regra inválida: {definicao!r}")
+    _verificar_chaves(definicao, CHAVES_REGRA, f"regra {definicao.get('nome')!r}")
+    if not isinstance(definicao.get("nome", ""), str):
+        raise ValueError(f"Nome de regra inválido: {definicao['nome']!r}")
+    cor = definicao.get("cor")
+    if cor not in CORES:
+        raise ValueError(f"Cor inválida na regra {definicao.get('nome')!r}: {cor!r}")
+
+    if "todos" in definicao and "algum" in definicao:
+        raise ValueError(f"Regra {definicao.get('nome')!r} com 'todos' e 'algum' ao mesmo tempo")
+    if "todos" in definicao:
+        condicoes, juncao = definicao["todos"], " and "
+    elif "algum" in definicao:
+        condicoes, juncao = definicao["algum"], " or "
+    else:
+        raise ValueError(f"Regra {definicao.get('nome')!r} sem 'todos' ou 'algum'")
+    if not isinstance(condicoes, list) or not condicoes:
+        raise ValueError(f"Regra {definicao.get('nome')!r} sem lista de condições")
+
+    expressao = juncao.join(f"({_compilar_condicao(c, constantes)})" for c in condicoes)
+    return f"    if {expressao}:\n        return {cor!r}\n"
+
+
+def compilar(definicao: dict) -> ProtocoloCompilado:
+    """Valida e compila a definição do protocolo"""
+    if not isinstance(definicao, dict):
+        raise ValueError("O protocolo deve ser um objeto JSON")
+    _verificar_chaves(definicao, CHAVES_PROTOCOLO, "protocolo")
+    versao = definicao.get("versao")
+    # A versão é gravada em paciente.versao_regras (String(TAMANHO_VERSAO))
+    if not isinstance(versao, str) or not versao.strip() or len(versao) > TAMANHO_VERSAO:
+        raise ValueError(f"'versao' deve ser um texto não vazio de até {TAMANHO_VERSAO} caracteres: {versao!r}")
+    padrao = definicao.get("padrao", "verde")
+    if padrao not in CORES:
+        raise ValueError(f"Cor padrão inválida: {padrao!r}")
+
+    regras = definicao.get("regras", [])
+    if not isinstance(regras, list):
+        raise ValueError("'regras' deve ser uma lista")
+    constantes = {"_sintomas_graves": _sintomas(definicao.get("sintomas_graves", []), "sintomas_graves")}
+    fonte = (
+        "def avaliar(selecionados, temperatura, saturacao, sistolica, diastolica):\n"
+        "    num_sintomas = len(selecionados)\n"
+        "    num_graves = len(selecionados & _sintomas_graves)\n"
+        + "".join(_compilar_regra(r, constantes) for r in regras)
+        + f"    return {padrao!r}\n"
+    )
+    namespace = dict(constantes, __builtins__={"len": len})
+    exec(compile(fonte, f"<regras {versao}>", "exec"), namespace)
+
+    return ProtocoloCompilado(
+        versao=versao,
+        padrao=padrao,
+        num_regras=len(regras),
+        avaliador=namespace["avaliar"],
+    )
+
+
+def carregar(caminho: str) -> ProtocoloCompilado:
+    with open(caminho, encoding="utf-8") as arquivo:
+        return compilar(json.load(arquivo))
+
+
+# Recarga a quente
+class MotorTriagem:
+    """Mantém o protocolo compilado e o recarrega quando o arquivo muda"""
+
+    def __init__(self, caminho: str, intervalo: float = 2.0):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.protocolo = carregar(caminho)
+        self._modificado = os.stat(caminho).st_mtime_ns
+        self._modificado_com_erro = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def avaliar(self, sintomas, temperatura: float, saturacao: int, sistolica: int,
+                diastolica: int) -> tuple[str, str]:
+        """Retorna (cor, versão do protocolo que a produziu)"""
+        protocolo = self.protocolo  # uma única leitura: cor e versão sempre consistentes
+        return protocolo.avaliar(sintomas, temperatura, saturacao, sistolica, diastolica), protocolo.versao
+
+    def recarregar_se_modificado(self) -> bool:
+        """Recompila o protocolo se o arquivo mudou; mantém o anterior em caso de erro"""
+        # A marca de modificação só é registrada após uma compilação bem-sucedida:
+        # uma regravação não atômica lida pela metade é tentada de novo na
+        # próxima verificação, mesmo que termine no mesmo tick de mtime.
+        modificado = None
+        try:
+            modificado = os.stat(self.caminho).st_mtime_ns
+            if modificado == self._modificado:
+                return False
+            protocolo = carregar(self.caminho)
+        except Exception as e:
+            if modificado != self._modificado_com_erro:
+                print(f"Erro ao recarregar regras de triagem: {e}")
+                self._modificado_com_erro = modificado
+            return False
+        self._modificado = modificado
+        self._modificado_com_erro = None
+        self.protocolo = protocolo
+        print(f"Regras de triagem recarregadas: versão {protocolo.versao}")
+        return True
+
+    def iniciar_monitoramento(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._monitorar, name="monitor-regras", daemon=True)
+            self._thread.start()
+
+    def encerrar(self) -> None:
+        self._parar.set()
+
+    def _monitorar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self.recarregar_se_modificado()
@@ -0,0 +1,37 @@
+import re
+
+# Os sinais vitais são persistidos como texto (ver models.Paciente);
+# estas funções convertem para valores numéricos, retornando None quando
+# o valor está ausente ou não pode ser interpretado.
+
+_PADRAO_PRESSAO = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+
+def decodificar_temperatura(valor: str | None) -> float | None:
+    """Converte a temperatura ("36,5" ou "36.5") para float"""
+    if not valor:
+        return None
+    try:
+        return float(valor.strip().replace(",", "."))
+    except ValueError:
+        return None
+
+
+def decodificar_saturacao(valor: str | None) -> int | None:
+    """Converte a saturação ("97" ou "97 %") para int"""
+    if not valor:
+        return None
+    try:
+        return int(valor.replace("%", "").strip())
+    except ValueError:
+        return None
+
+
+def decodificar_pressao(valor: str | None) -> tuple[int | None, int | None]:
+    """Converte a pressão ("120/80") para (sistólica, diastólica)"""
+    if not valor:
+        return None, None
+    correspondencia = _PADRAO_PRESSAO.match(valor)
+    if not correspondencia:
+        return None, None
+    return int(correspondencia.group(1)), int(correspondencia.group(2))
@@ -0,0 +1,433 @@
+"""Teste de longa duração (soak) e detector de vazamentos
+
+Uso:
+    python soak.py [--ciclos N] [--escala-tempo X] [--intervalo N] [--top N]
+
+Executa milhares de ciclos de triagem simulados sem interface gráfica,
+percorrendo as telas de app.py com uma página headless, um sensor serial
+simulado e um relógio acelerado. Além do fluxo completo, os ciclos sorteiam
+(ver CENARIOS) CPFs inválidos/inexistentes, que disparam os Timers de
+mostrar_erro, e o abandono de medições de temperatura, saturação e pressão
+no meio, que deixa leituras do sensor e Timers vivos após a troca de tela.
+O banco é sempre um SQLite temporário. A cada --intervalo ciclos são
+amostrados:
+
+    threads            threads vivas
+    memoria            bytes alocados segundo o tracemalloc
+    seriais_abertas    portas seriais (reais ou simuladas) ainda abertas
+    conexoes_db        conexões em uso nos pools síncrono e assíncrono
+
+O teste falha (código de saída 1) se alguma dessas séries crescer de forma
+sustentada após o aquecimento, e relata os principais pontos de alocação,
+os tipos de objeto que mais cresceram e as threads remanescentes.
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import gc
+import inspect
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import weakref
+from unittest import mock
+
+# Banco SQLite descartável; precisa ser definido antes de importar app/database
+_pasta_soak = tempfile.mkdtemp(prefix="vitally-soak-")
+# (sempre sobrescreve: num quiosque essas variáveis apontam para o banco real)
+os.environ["VITALLY_DATABASE_URL"] = f"sqlite:///{_pasta_soak}/soak.db"
+os.environ["VITALLY_DATABASE_URL_ASYNC"] = f"sqlite+aiosqlite:///{_pasta_soak}/soak.db"
+
+import flet as ft
+import serial
+
+import app
+import database
+import database_async
+from impressao import Spooler, ImpressoraArquivo
+from models import Pessoa
+
+TOLERANCIAS = {
+    "threads": 2,
+    "memoria": 1024 * 1024,
+    "seriais_abertas": 0,
+    "conexoes_db": 0,
+}
+
+
+# Ambiente simulado
+class PaginaHeadless:
+    """Substituto de ft.Page que apenas guarda a árvore de controles"""
+
+    def __init__(self):
+        self.controls = []
+        self.title = ""
+        self.atualizacoes = 0
+
+    def clean(self) -> None:
+        self.controls.clear()
+
+    def add(self, *controles) -> None:
+        self.controls.extend(controles)
+
+    def update(self) -> None:
+        self.atualizacoes += 1
+
+    def controles(self):
+        pendentes = list(self.controls)
+        while pendentes:
+            controle = pendentes.pop()
+            yield controle
+            pendentes.extend(getattr(controle, "controls", None) or [])
+            conteudo = getattr(controle, "content", None)
+            if isinstance(conteudo, ft.Control):
+                pendentes.append(conteudo)
+
+    def botao(self, texto: str):
+        """Retorna o botão com o texto informado, ou None se ainda não estiver na página"""
+        for controle in list(self.controles()):
+            if getattr(controle, "text", None) == texto and getattr(controle, "on_click", None):
+                return controle
+        return None
+
+    def do_tipo(self, tipo) -> list:
+        return [controle for controle in self.controles() if isinstance(controle, tipo)]
+
+
+class RelogioAcelerado:
+    """Relógio cujo tempo passa `escala` vezes mais rápido"""
+
+    def __init__(self, escala: float):
+        self.escala = escala
+        self.inicio = time.time()
+
+    def time(self) -> float:
+        return self.inicio + (time.time() - self.inicio) * self.escala
+
+    def sleep(self, segundos: float) -> None:
+        time.sleep(segundos / self.escala)
+
+    def timer(self, intervalo: float, funcao, *args, **kwargs) -> threading.Timer:
+        return threading.Timer(intervalo / self.escala, funcao, *args, **kwargs)
+
+    async def sleep_async(self, segundos: float) -> None:
+        await asyncio.sleep(segundos / self.escala)
+
+
+class SensorSimulado:
+    """Substituto de serial.Serial que entrega algumas leituras de temperatura"""
+
+    instancias = weakref.WeakSet()
+
+    def __init__(self, *args, **kwargs):
+        self.is_open = True
+        self.linhas = [f"{random.uniform(35.5, 39.5):.1f}\n".encode() for _ in range(3)]
+        SensorSimulado.instancias.add(self)
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.linhas[0]) if self.is_open and self.linhas else 0
+
+    def readline(self) -> bytes:
+        return self.linhas.pop(0)
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+# Sondas
+def contar_seriais_abertas() -> int:
+    abertas = sum(1 for sensor in SensorSimulado.instancias if sensor.is_open)
+    # Verifica o MRO em vez de isinstance: SerialBase é um ABC e isinstance sobre
+    # todos os objetos do gc encheria o cache do abc, gerando um falso vazamento
+    abertas += sum(1 for objeto in gc.get_objects()
+                   if serial.SerialBase in type(objeto).__mro__ and objeto.is_open)
+    return abertas
+
+
+def contar_conexoes_db() -> int:
+    # NullPool (usado pelo aiosqlite em algumas versões) não contabiliza conexões
+    pools = (database.engine.pool, database_async.engine_async.sync_engine.pool)
+    return sum(getattr(pool, "checkedout", lambda: 0)() for pool in pools)
+
+
+SONDAS = {
+    "threads": threading.active_count,
+    "memoria": lambda: tracemalloc.get_traced_memory()[0],
+    "seriais_abertas": contar_seriais_abertas,
+    "conexoes_db": contar_conexoes_db,
+}
+
+
+def detectar_crescimento(valores: list[float], tolerancia: float) -> float | None:
+    """Retorna o crescimento estimado se a série cresce de forma sustentada, senão None
+
+    Usa a inclinação por mínimos quadrados projetada sobre toda a série e
+    exige que o último quarto fique inteiramente acima do primeiro, para
+    não confundir oscilações com crescimento.
+    """
+    n = len(valores)
+    if n < 4:
+        return None
+    media_x = (n - 1) / 2
+    media_y = sum(valores) / n
+    covariancia = sum((x - media_x) * (y - media_y) for x, y in enumerate(valores))
+    variancia = sum((x - media_x) ** 2 for x in range(n))
+    crescimento = covariancia / variancia * (n - 1)
+    quarto = max(1, n // 4)
+    if crescimento > tolerancia and min(valores[-quarto:]) > max(valores[:quarto]):
+        return crescimento
+    return None
+
+
+# Ciclo de triagem
+async def esperar(condicao, timeout: float, descricao: str) -> None:
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            raise TimeoutError(f"Tempo esgotado aguardando {descricao}")
+        await asyncio.sleep(0.005)
+
+
+async def clicar(pagina: PaginaHeadless, texto: str, timeout: float) -> None:
+    # As telas definem o título antes de pagina.add(), muitas vezes em uma
+    # thread de Timer ou do sensor: espera o botão existir, não só o título.
+    await esperar(lambda: pagina.botao(texto) is not None, timeout, f"botão '{texto}' em '{pagina.title}'")
+    botao = pagina.botao(texto)
+    resultado = botao.on_click(types.SimpleNamespace(control=botao, page=pagina))
+    if inspect.isawaitable(resultado):
+        await resultado
+
+
+async def ir_ate(pagina: PaginaHeadless, cpf: str, tela: str, timeout: float) -> None:
+    """Percorre o fluxo normal desde a tela inicial até `tela`"""
+    app.tela_inicial(pagina)
+    await clicar(pagina, "Iniciar Atendimento", timeout)
+
+    pagina.do_tipo(ft.TextField)[0].value = cpf
+    await clicar(pagina, "Consultar", timeout)
+    await esperar(lambda: pagina.title == "Vitally - Biometria", timeout, "biometria")
+
+    etapas = [
+        ("Iniciar Verificação", "Vitally - Temperatura"),
+        ("Medir Temperatura", "Vitally - Saturação"),
+        ("Medir Saturação", "Vitally - Pressão"),
+    ]
+    for botao, proxima in etapas:
+        if pagina.title == tela:
+            return
+        await clicar(pagina, botao, timeout)
+        await esperar(lambda: pagina.title == proxima, timeout, proxima)
+
+
+async def ciclo_completo(pagina: PaginaHeadless, cpf: str, relogio: RelogioAcelerado, timeout: float) -> None:
+    await ir_ate(pagina, cpf, "Vitally - Pressão", timeout)
+
+    await clicar(pagina, "Medir Pressão", timeout)
+    await esperar(lambda: app.valor_pressao is not None, timeout, "leitura de pressão")
+    await clicar(pagina, "Finalizar", timeout)
+
+    checkboxes = pagina.do_tipo(ft.Checkbox)
+    for checkbox in random.sample(checkboxes, random.randint(1, len(checkboxes))):
+        checkbox.value = True
+    await clicar(pagina, "Confirmar", timeout)
+    await esperar(lambda: pagina.title == "Vitally - Classificação de Risco", timeout, "classificação")
+
+    await clicar(pagina, "Voltar ao início", timeout)
+
+
+async def ciclo_cpf_invalido(pagina: PaginaHeadless, cpf: str, relogio: RelogioAcelerado, timeout: float) -> None:
+    """CPF curto e CPF inexistente: cada erro dispara um Timer em mostrar_erro"""
+    app.tela_inicial(pagina)
+    await clicar(pagina, "Iniciar Atendimento", timeout)
+    campo = pagina.do_tipo(ft.TextField)[0]
+    for invalido in (cpf[:random.randint(0, 10)], CPF_INEXISTENTE):
+        campo.value = invalido
+        await clicar(pagina, "Consultar", timeout)
+    await clicar(pagina, "Voltar", timeout)
+
+
+def ciclo_abandono(tela: str, medir: str, sair: str):
+    """Inicia a medição em `tela` e sai por `sair` antes de ela terminar"""
+
+    async def ciclo(pagina: PaginaHeadless, cpf: str, relogio: RelogioAcelerado, timeout: float) -> None:
+        await ir_ate(pagina, cpf, tela, timeout)
+        await clicar(pagina, medir, timeout)
+        # Sai em um ponto aleatório da medição (4 s no relógio acelerado)
+        await asyncio.sleep(random.uniform(0, 4 / relogio.escala))
+        await clicar(pagina, sair, timeout)
+
+    return ciclo
+
+
+CPF_INEXISTENTE = "99999999999"
+
+# Cenários sorteados a cada ciclo, com seus pesos
+CENARIOS = {
+    "completo": (ciclo_completo, 5),
+    "cpf_invalido": (ciclo_cpf_invalido, 2),
+    "abandono_temperatura": (ciclo_abandono("Vitally - Temperatura", "Medir Temperatura", "Voltar"), 1),
+    "abandono_saturacao": (ciclo_abandono("Vitally - Saturação", "Medir Saturação", "Voltar"), 1),
+    # a tela de pressão não tem "Voltar"; "Finalizar" é a única saída
+    "abandono_pressao": (ciclo_abandono("Vitally - Pressão", "Medir Pressão", "Finalizar"), 1),
+}
+
+
+async def executar_ciclo(pagina: PaginaHeadless, cenario: str, cpf: str, relogio: RelogioAcelerado,
+                         timeout: float) -> bool:
+    """Executa um ciclo e aguarda as threads que ele criou terminarem
+
+    Timers e leituras do sensor abandonados continuam vivos e podem trocar
+    de tela sozinhos; o próximo ciclo só começa quando o número de threads
+    volta ao de antes (ou o prazo se esgota). Retorna False se o prazo se
+    esgotou: essas threads aparecem como crescimento na série `threads`.
+    """
+    app.valor_temperatura = app.valor_saturacao = app.valor_pressao = None
+    antes = threading.active_count()
+    await CENARIOS[cenario][0](pagina, cpf, relogio, timeout)
+
+    # 200 s no relógio acelerado cobrem a leitura do sensor (120 s) e as pausas
+    prazo = time.monotonic() + max(1.0, 200 / relogio.escala)
+    while threading.active_count() > antes:
+        if time.monotonic() > prazo:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+def popular(quantidade: int) -> list[str]:
+    cpfs = [f"{i:011d}" for i in range(1, quantidade + 1)]
+    with database.Session() as session:
+        if not session.query(Pessoa).count():
+            session.add_all(
+                Pessoa(name=f"Paciente {i}", cpf=cpf, data_nascimento=datetime.date(1970, 1, 1),
+                       sexo="M", carteira=f"{i:015d}")
+                for i, cpf in enumerate(cpfs, start=1)
+            )
+            session.commit()
+    return cpfs
+
+
+# Relatório
+def contar_tipos() -> collections.Counter:
+    return collections.Counter(type(objeto).__qualname__ for objeto in gc.get_objects())
+
+
+def relatar(amostras: dict[str, list], crescimentos: dict[str, float], base_memoria, base_tipos,
+            base_threads: set, top: int) -> None:
+    print("\n=== Séries (primeira / última amostra após aquecimento) ===")
+    for nome, valores in amostras.items():
+        if not valores:
+            continue
+        estado = f"CRESCIMENTO ~{crescimentos[nome]:.0f}" if nome in crescimentos else "estável"
+        print(f"{nome:16} {valores[0]:>12} -> {valores[-1]:>12}  {estado}")
+
+    print(f"\n=== Top {top} pontos de alocação (desde o aquecimento) ===")
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    atual = tracemalloc.take_snapshot().filter_traces(filtros)
+    for estatistica in atual.compare_to(base_memoria.filter_traces(filtros), "lineno")[:top]:
+        print(estatistica)
+
+    print(f"\n=== Top {top} tipos de objeto que mais cresceram ===")
+    diferenca = contar_tipos()
+    diferenca.subtract(base_tipos)
+    for nome, quantidade in diferenca.most_common(top):
+        if quantidade <= 0:
+            break
+        print(f"{nome:40} +{quantidade}")
+
+    remanescentes = [t for t in threading.enumerate() if t.ident not in base_threads]
+    print(f"\n=== Threads remanescentes ({len(remanescentes)}) ===")
+    for thread in remanescentes[:top]:
+        print(f"{thread.name} ({type(thread).__name__}, daemon={thread.daemon})")
+
+
+async def soak(ciclos: int, escala: float, intervalo: int, aquecimento: float, timeout: float, top: int) -> bool:
+    relogio = RelogioAcelerado(escala)
+    pagina = PaginaHeadless()
+    spooler = Spooler(ImpressoraArquivo(os.path.join(_pasta_soak, "fichas.bin")))
+
+    database.engine.echo = False
+    database_async.engine_async.sync_engine.echo = False
+    cpfs = popular(200)
+
+    with mock.patch.object(app, "time", types.SimpleNamespace(time=relogio.time, sleep=relogio.sleep)), \
+         mock.patch.object(app, "threading", types.SimpleNamespace(Timer=relogio.timer, Thread=threading.Thread)), \
+         mock.patch.object(app, "asyncio", types.SimpleNamespace(sleep=relogio.sleep_async)), \
+         mock.patch.object(app, "serial", types.SimpleNamespace(Serial=SensorSimulado)), \
+         mock.patch.object(app, "spooler", spooler):
+
+        tracemalloc.start(10)
+        inicio_medicao = max(1, int(ciclos * aquecimento))
+        amostras = {nome: [] for nome in SONDAS}
+        base_memoria = base_tipos = None
+        base_threads = set()
+        inicio = time.monotonic()
+        nomes, pesos = zip(*((nome, peso) for nome, (_, peso) in CENARIOS.items()))
+        executados = collections.Counter()
+        nao_encerrados = collections.Counter()
+
+        for ciclo in range(1, ciclos + 1):
+            cenario = random.choices(nomes, pesos)[0]
+            executados[cenario] += 1
+            if not await executar_ciclo(pagina, cenario, random.choice(cpfs), relogio, timeout):
+                nao_encerrados[cenario] += 1
+            if ciclo == inicio_medicao:
+                gc.collect()
+                base_memoria = tracemalloc.take_snapshot()
+                base_tipos = contar_tipos()
+                base_threads = {t.ident for t in threading.enumerate()}
+            if ciclo >= inicio_medicao and ciclo % intervalo == 0:
+                spooler.aguardar()
+                gc.collect()
+                for nome, sonda in SONDAS.items():
+                    amostras[nome].append(sonda())
+                decorrido = time.monotonic() - inicio
+                print(f"ciclo {ciclo}/{ciclos} ({ciclo / decorrido:.1f} ciclos/s) "
+                      + " ".join(f"{nome}={valores[-1]}" for nome, valores in amostras.items()))
+
+        crescimentos = {}
+        for nome, valores in amostras.items():
+            crescimento = detectar_crescimento(valores, TOLERANCIAS[nome])
+            if crescimento is not None:
+                crescimentos[nome] = crescimento
+
+        relatar(amostras, crescimentos, base_memoria, base_tipos, base_threads, top)
+        tracemalloc.stop()
+
+    print("\n=== Cenários (executados / com threads não encerradas no prazo) ===")
+    for nome in nomes:
+        print(f"{nome:24} {executados[nome]:>6} {nao_encerrados[nome]:>6}")
+
+    spooler.encerrar(timeout=5)
+    print(f"\nFichas: {spooler.metricas.resumo()}")
+    if crescimentos:
+        print(f"\nFALHA: crescimento sem limite em {', '.join(crescimentos)}")
+        return False
+    print("\nOK: nenhum crescimento sustentado detectado")
+    return True
+
+
+def main() -> None:
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Soak test e detector de vazamentos do Vitally")
+    parser.add_argument("--ciclos", type=int, default=2000, help="Ciclos de triagem simulados")
+    parser.add_argument("--escala-tempo", type=float, default=1000, help="Fator de aceleração dos timers e do sensor")
+    parser.add_argument("--intervalo", type=int, default=20, help="Ciclos entre amostras")
+    parser.add_argument("--aquecimento", type=float, default=0.1, help="Fração inicial de ciclos ignorada")
+    parser.add_argument("--timeout", type=float, default=30, help="Tempo máximo por etapa, em segundos reais")
+    parser.add_argument("--top", type=int, default=15, help="Itens exibidos em cada seção do relatório")
+    args = parser.parse_args()
+
+    ok = asyncio.run(soak(args.ciclos, args.escala_tempo, args.intervalo, args.aquecimento, args.timeout, args.top))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()